@@ -0,0 +1,133 @@
+import math
+from functools import lru_cache
+
+try:
+    from numba import njit, prange
+except ImportError:
+    # Numba is optional: without it the kernels run as plain Python loops.
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+    prange = range
+
+
+# Below this many samples per chunk, starting the thread pool costs more
+# than the parallel loop saves, so the kernels run serially.
+PARALLEL_MIN_SAMPLES = 4096
+
+_SIN_SIGNATURE = 'void(f8[::1], i8, f8, f8, f8, f8)'
+
+
+
+@njit(inline='always', fastmath=True)
+def _edge_position(x, edge, inv_edge_w, step):
+    # Zero-width edges (step) jump straight from 0 to 1 after `edge`
+    if step:
+        return 1.0 if x > edge else 0.0
+    return min(max((x - edge) * inv_edge_w, 0.0), 1.0)
+
+
+@njit(inline='always', fastmath=True)
+def _delta_sample(t, T, edge0, edge2, inv_edge_w, step, amplitude, offset):
+    x = t - T*math.floor(t/T)
+    # Branchless: rising smoothstep minus falling smoothstep, each
+    # evaluated on its edge position clipped to [0, 1]
+    u_up = _edge_position(x, edge0, inv_edge_w, step)
+    u_down = _edge_position(x, edge2, inv_edge_w, step)
+    return amplitude * (u_up*u_up*(3 - 2*u_up) - u_down*u_down*(3 - 2*u_down)) + offset
+
+
+@lru_cache(maxsize=None)
+def make_delta_kernel(n, dt, T, edge0, edge2, inv_edge_w, step, amplitude, offset):
+    """Return a DeltaUpDown kernel `kernel(out, t_offset)` specialized for one chunk layout.
+
+    The kernel writes `n` samples, sample i taken at time i*dt + t_offset,
+    into `out`. All arguments are frozen into the compiled code as constants,
+    so LLVM can fold them and unroll the fixed-length loop. The period `T`,
+    the edge starts, the inverse edge width and the zero-width `step` flag
+    are precomputed by SignalFunctions.DeltaUpDown in main.py, which also
+    describes the shape of the signal. Kernels are memoized by their arguments,
+    so instances with the same parameters share them.
+    """
+    # The explicit signature compiles the kernel right here, so the first
+    # chunk doesn't pay the JIT cost inside the real-time generator loop.
+    @njit('void(f8[::1], f8)', parallel=n >= PARALLEL_MIN_SAMPLES,
+          fastmath=True, boundscheck=False)
+    def kernel(out, t_offset):
+        for i in prange(n):
+            out[i] = _delta_sample(i*dt + t_offset, T, edge0, edge2, inv_edge_w, step,
+                                   amplitude, offset)
+
+    return kernel
+
+
+# The sine kernels run a recurrence instead of calling sin per sample:
+# s[i] = 2*cos(w*dt)*s[i-1] - s[i-2]. The oscillator is re-seeded with two
+# exact sin values every _SIN_BLOCK samples, which bounds rounding drift and
+# makes the blocks independent of each other.
+_SIN_BLOCK = 256
+
+
+@njit(inline='always', fastmath=True)
+def _sin_block(out, start, stop, w, dt, t_offset, c, offset):
+    s2 = math.sin(w * ((start - 2)*dt + t_offset))
+    s1 = math.sin(w * ((start - 1)*dt + t_offset))
+    for i in range(start, stop):
+        s0 = c*s1 - s2
+        out[i] = s0 + offset
+        s2 = s1
+        s1 = s0
+
+
+@njit(_SIN_SIGNATURE, cache=True, fastmath=True, boundscheck=False)
+def _sin_serial(out, n, dt, t_offset, frequency, offset):
+    w = 2 * math.pi * frequency
+    c = 2 * math.cos(w * dt)
+    for start in range(0, n, _SIN_BLOCK):
+        _sin_block(out, start, min(start + _SIN_BLOCK, n), w, dt, t_offset, c, offset)
+
+
+@njit(_SIN_SIGNATURE, parallel=True, cache=True, fastmath=True, boundscheck=False)
+def _sin_parallel(out, n, dt, t_offset, frequency, offset):
+    w = 2 * math.pi * frequency
+    c = 2 * math.cos(w * dt)
+    for block in prange((n + _SIN_BLOCK - 1) // _SIN_BLOCK):
+        start = block * _SIN_BLOCK
+        _sin_block(out, start, min(start + _SIN_BLOCK, n), w, dt, t_offset, c, offset)
+
+
+def sin_kernel(out, n, dt, t_offset, frequency, offset):
+    """Write `n` samples of sin(2*pi*frequency*t) + offset into `out`."""
+    kernel = _sin_parallel if n >= PARALLEL_MIN_SAMPLES else _sin_serial
+    kernel(out, n, dt, t_offset, frequency, offset)
+
+
+# Compiled eagerly for the supported buffer dtypes so no write in the
+# generator thread ever triggers a JIT compile.
+@njit(['i8(f4[::1], i8, f8[::1])', 'i8(f8[::1], i8, f8[::1])'], cache=True, nogil=True)
+def rb_write(buf, write_ptr, data):
+    """Copy `data` into the ring buffer array `buf` at `write_ptr` and return the new write pointer.
+
+    Runs without the GIL; see RingBuffer.write for the wrap-around rules.
+    """
+    size = buf.shape[0]
+    n = data.shape[0]
+    if n >= size:
+        # If the data is larger than the buffer, just keep the last part.
+        buf[:] = data[n - size:]
+        return 0
+    # n < size, so one subtraction replaces the modulo
+    end_ptr = write_ptr + n
+    if end_ptr >= size:
+        end_ptr -= size
+    if end_ptr < write_ptr:
+        # Wrap around
+        first_part = size - write_ptr
+        buf[write_ptr:] = data[:first_part]
+        buf[:end_ptr] = data[first_part:]
+    else:
+        # No wrap
+        buf[write_ptr:end_ptr] = data
+    return end_ptr
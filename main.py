@@ -1,5 +1,6 @@
 import numpy as np
 
+from kernels import make_delta_kernel, sin_kernel
 from ring_buffer import RingBuffer, LivePlotter, SignalGenerator
 
 
@@ -10,50 +11,80 @@ class SignalFunctions:
         def __init__(self, frequency = 1, offset = 0):
             self.offset = offset
             self.frequency = frequency
+            self._out = None
          
             
-        def __call__(self, t):
+        def __call__(self, t, out=None):
+            """Evaluate the sine in place into `out`.
+
+            Without `out` the result goes into an internal buffer that is
+            reused (and overwritten) by the next call.
+            """
             #print(self.data[self.current_read_out[0]: self.current_read_out[1]])
             #self.current_read_out = [x +  self.interval_steps for x in self.current_read_out]
-            return np.sin(2 * np.pi * t * self.frequency) + self.offset
+            if out is None:
+                if self._out is None or self._out.shape != np.shape(t):
+                    self._out = np.empty(np.shape(t), dtype=np.float64)
+                out = self._out
+            np.multiply(t, 2 * np.pi * self.frequency, out=out)
+            np.sin(out, out=out)
+            out += self.offset
+            return out
+
+        def fill(self, out, t_offset, dt):
+            """Write len(out) samples starting at t_offset into out (compiled kernel)."""
+            sin_kernel(out, out.size, dt, t_offset, self.frequency, self.offset)
 
             
  
         
     class DeltaUpDown:
        def __init__(self, amplitude=1.0, frequency=1.0, offset=0, edge_time = 0.05):
+            # edge_time is the width of each edge as a fraction of the period.
+            # The rising edge starts at 0.1*T and the falling one at 0.6*T, so
+            # above 0.5 they would overlap.
+            if not 0 <= edge_time <= 0.5:
+                raise ValueError("edge_time must be between 0 and 0.5")
             self.amplitude = amplitude
             self.frequency = frequency
             self.offset = offset
             self.edge_time = edge_time
             
-            
-       def __call__(self, t):
-            data = []
-            T = 1/self.frequency
-            edge0 = 0.1*T
-            edge1 = (0.1+self.edge_time)*T
-            
-            edge2 = 0.6*T
-            edge3 = (0.6+self.edge_time)*T
+            # The edges only depend on the parameters above, compute them once
+            self._T = 1/self.frequency
+            self._edge0 = 0.1*self._T  # Start of the rising edge
+            self._edge2 = 0.6*self._T  # Start of the falling edge
+            # Both edges are edge_time*T wide; edge_time=0 gives hard steps (square wave)
+            self._step = self.edge_time == 0
+            self._inv_edge_w = 0.0 if self._step else 1/(self.edge_time*self._T)
+            # Specialized kernel for the last chunk layout, keyed by (size, dt)
+            self._kernel = None
+            self._kernel_key = None
             
             
-            t_mod = [t_val%T for t_val in t]
-            for x in t_mod[:int(len(t_mod)/2)]:
-                if x <= edge0:
-                    data.append(0.0 + self.offset) 
-                elif x >= edge0 and x <= edge1:
-                   # Scale/shift x into [0, 1]
-                   t = (x - edge0) / (edge1 - edge0)
-                   data.append( self.amplitude* ( t**2 * (3 - 2*t)) + self.offset)
-                elif x >= edge1 and x <= edge2:
-                    data.append(self.amplitude * 1.0 + self.offset)
-                elif x >= edge2 and x <= edge3:
-                   t = (x - edge2) / (edge3 - edge2)
-                   data.append(self.amplitude* (1-(t**2 * (3 - 2*t))) + self.offset)
-                else: 
-                    data.append(self.amplitude * 0. + self.offset)
-            return data
+       def _edge_position(self, t_mod, edge):
+            """Position of t_mod within the edge starting at `edge`, clipped to [0, 1]."""
+            if self._step:
+                return (t_mod > edge).astype(np.float64)
+            return np.clip((t_mod - edge) * self._inv_edge_w, 0.0, 1.0)
+
+       def __call__(self, t):
+            t_mod = np.mod(t, self._T)
+            # The signal is the rising smoothstep minus the falling one,
+            # with no per-segment branches
+            u_up = self._edge_position(t_mod, self._edge0)
+            u_down = self._edge_position(t_mod, self._edge2)
+            ramp_up = u_up*u_up*(3 - 2*u_up)
+            ramp_down = u_down*u_down*(3 - 2*u_down)
+            return self.amplitude * (ramp_up - ramp_down) + self.offset
+
+       def fill(self, out, t_offset, dt):
+            """Write len(out) samples starting at t_offset into out (compiled kernel)."""
+            if self._kernel_key != (out.size, dt):
+                self._kernel = make_delta_kernel(out.size, dt, self._T, self._edge0, self._edge2,
+                                                 self._inv_edge_w, self._step, self.amplitude, self.offset)
+                self._kernel_key = (out.size, dt)
+            self._kernel(out, t_offset)
                     
               
                     
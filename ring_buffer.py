@@ -1,54 +1,76 @@
 import numpy as np
 import threading
 import time
-import itertools
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+
+from kernels import rb_write, sin_kernel
 
 
 
 class RingBuffer:
-    def __init__(self, size):
-        """Initialize the ring buffer with a fixed size."""
+    def __init__(self, size, dtype=np.float32):
+        """Initialize the ring buffer with a fixed size and sample dtype.
+
+        float32 halves the memory traffic of every write and read compared
+        to float64 while keeping plenty of precision for plotting. Only
+        float32 and float64 are supported.
+
+        The buffer is lock-free for a single producer and a single consumer:
+        only the writer moves `write_ptr`, and it does so as the last step of
+        each write. Readers take one snapshot of `write_ptr` and work from it.
+        """
+        if np.dtype(dtype) not in (np.float32, np.float64):
+            raise ValueError("dtype must be float32 or float64")
         self.size = size
-        self.buffer = np.zeros(size, dtype=float)
+        self.buffer = np.zeros(size, dtype=dtype)
         self.write_ptr = 0
-        self.lock = threading.Lock()
+        self.write_seq = 0  # Number of completed writes, lets readers detect new data
        
 
     def write(self, data):
         """Write an array of data into the ring buffer, 
-        overwriting older data if necessary."""
-        with self.lock:
-            n = len(data)
-            if n >= self.size:
-                # If the data is larger than the buffer, just keep the last part.
-                self.buffer[:] = data[-self.size:]
-                self.write_ptr = 0
-            else:
-                end_ptr = (self.write_ptr + n) % self.size
-                if end_ptr < self.write_ptr:
-                    # Wrap around
-                    first_part = self.size - self.write_ptr
-                    self.buffer[self.write_ptr:] = data[:first_part]
-                    self.buffer[0:end_ptr] = data[first_part:]
-                else:
-                    # No wrap
-                    self.buffer[self.write_ptr:end_ptr] = data
-                self.write_ptr = end_ptr
-
-    def read_latest(self, num_samples):
-        """Read the most recent `num_samples` data points from the buffer."""
-        with self.lock:
-            if num_samples > self.size:
-                raise ValueError("num_samples larger than buffer size")
-            start = (self.write_ptr - num_samples) % self.size
-            if start + num_samples <= self.size:
-                return self.buffer[start:start+num_samples].copy()
-            else:
-                # Wrap around read
-                end_len = (start + num_samples) - self.size
-                return np.concatenate((self.buffer[start:], self.buffer[:end_len]))
+        overwriting older data if necessary.
+
+        The copy runs in compiled code without the GIL (kernels.rb_write).
+        """
+        # rb_write is only compiled for contiguous float64 data (no copy for the
+        # generator's chunks); it casts to the buffer dtype while copying
+        data = np.ascontiguousarray(data, dtype=np.float64)
+        # Publish the new data (a single int store is atomic under the GIL)
+        self.write_ptr = rb_write(self.buffer, self.write_ptr, data)
+        self.write_seq += 1
+
+    def read_latest(self, num_samples, out=None):
+        """Read the most recent `num_samples` data points from the buffer.
+
+        If `out` is given the samples are copied into it (no allocation)
+        and `out` is returned.
+        """
+        if num_samples > self.size:
+            raise ValueError("num_samples larger than buffer size")
+        start = self.write_ptr - num_samples
+        if start < 0:
+            start += self.size
+        if out is None:
+            out = np.empty(num_samples, dtype=self.buffer.dtype)
+        if start + num_samples <= self.size:
+            np.copyto(out, self.buffer[start:start+num_samples])
+        else:
+            # Wrap around read
+            first_part = self.size - start
+            np.copyto(out[:first_part], self.buffer[start:])
+            np.copyto(out[first_part:], self.buffer[:num_samples - first_part])
+        return out
+
+    def read_raw(self, out=None):
+        """Return the raw memory layout of the buffer (index 0 first, not chronological).
+
+        Without `out` this is the live buffer array itself, not a copy.
+        """
+        if out is None:
+            return self.buffer
+        np.copyto(out, self.buffer)
+        return out
             
 
 
@@ -78,6 +100,13 @@ class LivePlotter:
         self.buffer = buffer
         self.size = buffer.size  # e.g. 16000
         self.interval = interval
+        # Screens are ~2000 px wide: plot the min and max of every `stride`
+        # samples instead of all of them, so spikes still show up.
+        self._stride = max(1, self.size // 2048)
+        self._bin_starts = np.arange(0, self.size, self._stride)
+        # x-values = direct indices [0..size-1], each bin start twice (min, max)
+        self._x = np.repeat(self._bin_starts, 2)
+        self._y = np.empty(self._x.size, dtype=float)
 
         self.fig, self.ax = plt.subplots()
         self.line, = self.ax.plot([], [], lw=2, label='Buffer Data')
@@ -94,9 +123,21 @@ class LivePlotter:
         self.ax.set_title('Raw Ring Buffer Memory Layout')
         self.ax.legend()
 
+        # The two artists are redrawn by hand on top of a cached background
+        self.line.set_animated(True)
+        self.ptr_marker.set_animated(True)
+        self._bg = None
+        self._seen_seq = -1  # buffer.write_seq of the last drawn frame
+
+    def _downsample(self, data):
+        """Min/max pool `data` into the preallocated plot array, one pair per bin."""
+        np.minimum.reduceat(data, self._bin_starts, out=self._y[0::2])
+        np.maximum.reduceat(data, self._bin_starts, out=self._y[1::2])
+        return self._y
+
     def init_animation(self):
-        """Initialize the animation with no data."""
-        self.line.set_data([], [])
+        """Initialize the animation; the x-values (buffer indices) never change after this."""
+        self.line.set_data(self._x, self._downsample(self.buffer.read_raw()))
         self.ptr_marker.set_data([], [])
         return self.line, self.ptr_marker
 
@@ -108,12 +149,16 @@ class LivePlotter:
         If write_ptr wraps from size-1 back to 0, you'll see the data 
         'jump' from the rightmost index to x=0.
         """
-        # 1) Just read the entire buffer array as is (no reordering)
-        data = self.buffer.buffer  # shape = (size,)
-        
-        # 2) x-values = direct indices [0..size-1]
-        x_vals = np.arange(self.size)
-        self.line.set_data(x_vals, data)
+        seq = self.buffer.write_seq
+        if seq == self._seen_seq:
+            # Nothing was written since the last frame
+            return self.line, self.ptr_marker
+        self._seen_seq = seq
+
+        # Just read the entire buffer array as is (no reordering);
+        # the x-values were set once in init_animation
+        data = self.buffer.read_raw()  # shape = (size,)
+        self.line.set_ydata(self._downsample(data))
         
         # (Optional) Show the pointer position in red
         ptr_x = self.buffer.write_ptr
@@ -122,16 +167,30 @@ class LivePlotter:
 
         return self.line, self.ptr_marker
 
+    def _on_draw(self, event):
+        """Capture the static background after every full redraw (first show, resize, ...)."""
+        self._bg = self.fig.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.line)
+        self.ax.draw_artist(self.ptr_marker)
+
+    def _blit_frame(self):
+        """Restore the cached background and redraw only the line and the pointer marker."""
+        if self._bg is None or self.buffer.write_seq == self._seen_seq:
+            return
+        self.update_animation(None)
+        canvas = self.fig.canvas
+        canvas.restore_region(self._bg)
+        self.ax.draw_artist(self.line)
+        self.ax.draw_artist(self.ptr_marker)
+        canvas.blit(self.ax.bbox)
+
     def start(self):
         """Start the animation."""
-        self.ani = FuncAnimation(
-            self.fig,
-            self.update_animation,
-            frames=itertools.count(),
-            init_func=self.init_animation,
-            interval=self.interval,
-            blit=True,
-        )
+        self.init_animation()
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+        self.timer = self.fig.canvas.new_timer(interval=self.interval)
+        self.timer.add_callback(self._blit_frame)
+        self.timer.start()
         plt.show()
 
 class SignalGenerator:
@@ -150,23 +209,44 @@ class SignalGenerator:
             Samples per second.
         func : callable or None
             The function used to generate samples. Must accept an array of time values (t) and return an array of samples.
+            If it also provides a `fill(out, t_offset, dt)` method, that compiled kernel is used instead and
+            writes the samples straight into a reusable buffer.
             If None, defaults to a sine function: amplitude * sin(2*pi*frequency*t).
         """
         self.buffer = buffer
         self.sample_rate = sample_rate
         self.running = False
         self.time_offset = 0.0  # Tracks the continuous time offset
+        self._allocate(0)
 
         if func is None:
             # Default to a sine function
-            self.func = lambda t: 1.0 * np.sin(2 * np.pi * 1.0 * t)
+            self.func = lambda t: np.sin(2 * np.pi * t)
+            self._fill = lambda out, t_offset, dt: sin_kernel(out, out.size, dt, t_offset, 1.0, 0.0)
         else:
             self.func = func
+            self._fill = getattr(func, 'fill', None)
+
+    def _allocate(self, n):
+        """Allocate the per-chunk work arrays for chunks of `n` samples."""
+        self._base_t = np.arange(n, dtype=np.float64) * (1/self.sample_rate)  # Chunk-relative sample times
+        self._t_scratch = np.empty(n, dtype=np.float64)  # Absolute sample times of the current chunk
+        self._out = np.empty(n, dtype=np.float64)  # Reused output of the compiled kernels
 
     def _generate_samples(self, duration=0.01):
         """Generate samples from the user-defined function for the given duration."""
-        t = np.arange(0, duration, 1/self.sample_rate) + self.time_offset
-        samples = self.func(t)
+        n = int(round(duration * self.sample_rate))
+        if self._out.size != n:
+            self._allocate(n)
+        if self._fill is not None:
+            self._fill(self._out, self.time_offset, 1/self.sample_rate)
+            samples = self._out
+        else:
+            np.add(self._base_t, self.time_offset, out=self._t_scratch)
+            samples = self.func(self._t_scratch)
+            if len(samples) != n:
+                # A short chunk would silently slow down the signal in the buffer
+                raise ValueError(f"func returned {len(samples)} samples for {n} time values")
         # Update time offset for continuity
         self.time_offset += duration
         return samples
@@ -177,13 +257,26 @@ class SignalGenerator:
         duration: length of each chunk generated per iteration
         interval: time between writes (simulates continuous feed)
         """
+        self._allocate(int(round(duration * self.sample_rate)))
+        if self._fill is not None:
+            # Generate one throwaway chunk so kernels specialized on the chunk
+            # size are compiled here rather than inside the real-time loop
+            self._fill(self._out, self.time_offset, 1/self.sample_rate)
         self.running = True
 
         def run():
+            # Sleep until fixed deadlines so generation time doesn't add up as drift
+            next_deadline = time.perf_counter()
             while self.running:
                 samples = self._generate_samples(duration)
                 self.buffer.write(samples)
-                time.sleep(interval)
+                next_deadline += interval
+                sleep_time = next_deadline - time.perf_counter()
+                if sleep_time > 0:
+                    time.sleep(sleep_time)
+                else:
+                    # Overrun: restart the schedule instead of bursting to catch up
+                    next_deadline = time.perf_counter()
 
         self.thread = threading.Thread(target=run, daemon=True)
         self.thread.start()